@@ -2,9 +2,9 @@
 """Export Maia2 PyTorch checkpoints to ONNX with optional quantisation.
 
 This script keeps the conversion as faithful as possible by:
-  * reusing the original preprocessing utilities (board_to_tensor,
-    map_to_category) so the exported graph sees the exact tensor format
-    used during training/inference;
+  * reproducing the original preprocessing (board_to_tensor's 18-plane
+    layout, map_to_category's ELO buckets) so the exported graph sees the exact tensor
+    format used during training/inference;
   * running an ONNX Runtime side-by-side check against the PyTorch
     model on a representative FEN set to make sure numerical drift is
     negligible;
@@ -13,30 +13,33 @@ This script keeps the conversion as faithful as possible by:
 
 The default export produces `maia2_models/rapid_model.onnx`.  Invoke
 `--quantize` to additionally create `rapid_model_quantized.onnx` after
-verifying accuracy.
+verifying accuracy, or `--static-quantize` to try full INT8 (weights and
+activations, calibrated on a `--calibration-fens` file of a few hundred
+positions) and keep it only if, on held-out positions, it still picks the
+same best moves as PyTorch and keeps win_prob within tolerance.
+`--export-static-bs1` also writes a fixed batch=1 graph
+(`rapid_model_bs1.onnx`) that ORT can shape-specialise for the
+single-position requests served by `maia-bot-server.py`.
 """
 
 from __future__ import annotations
 
 import argparse
 import json
-import os
+import uuid
 from pathlib import Path
-from typing import Iterable, Tuple
+from typing import TYPE_CHECKING, Iterable, List, Tuple
 
-import chess
 import numpy as np
-import onnx
 import onnxruntime as ort
-import torch
-from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic
 
-from maia2 import model as maia_model_lib
-from maia2.utils import (
-    board_to_tensor,
-    create_elo_dict,
-    map_to_category,
-)
+from maia_preprocessing import boards_to_planes, elo_bucket, model_board, session_options
+
+# torch, onnx, maia2 (which imports torch) and onnxruntime.quantization each
+# take seconds to import; they are imported inside the functions that need
+# them so `import convert_model` and non-quantising paths stay cheap.
+if TYPE_CHECKING:
+    import torch
 
 # Representative positions covering different game phases so the export
 # is traced with meaningful data. Feel free to extend.
@@ -50,18 +53,14 @@ REPRESENTATIVE_FENS = [
 
 def _prepare_inputs(fens: Iterable[str], elo: int) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
     """Convert FENs to tensors consistent with training preprocessing."""
-    elo_dict = create_elo_dict()
-    elo_bucket = map_to_category(elo, elo_dict)
+    import torch
+
+    bucket = elo_bucket(elo)
 
-    boards = []
-    for fen in fens:
-        board = chess.Board(fen)
-        tensor = board_to_tensor(board)  # (18, 8, 8)
-        boards.append(tensor)
-    boards_tensor = torch.stack(boards, dim=0).to(torch.float32)
+    boards_tensor = torch.from_numpy(boards_to_planes([model_board(fen) for fen in fens]))
 
     batch = boards_tensor.shape[0]
-    elo_tensor = torch.full((batch,), elo_bucket, dtype=torch.long)
+    elo_tensor = torch.full((batch,), bucket, dtype=torch.long)
     return boards_tensor, elo_tensor.clone(), elo_tensor.clone()
 
 
@@ -71,30 +70,46 @@ def export_onnx_model(
     sample_fens: Iterable[str],
     sample_elo: int,
     opset: int = 17,
+    dynamic_batch: bool = True,
 ) -> None:
+    """Trace ``model`` (already on CPU) to ONNX at ``output_path``."""
+    import onnx
+    import torch
+
     output_path = output_path.resolve()
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
     boards, elos_self, elos_oppo = _prepare_inputs(sample_fens, sample_elo)
-
-    model_cpu = model.cpu().eval()
+    if dynamic_batch:
+        dynamic_axes = {
+            "board_input": {0: "batch"},
+            "elo_self": {0: "batch"},
+            "elo_oppo": {0: "batch"},
+            "move_probs": {0: "batch"},
+            "side_info_logits": {0: "batch"},
+            "win_prob": {0: "batch"},
+        }
+    else:
+        # Static graph: trace with exactly one position so every shape is fixed.
+        dynamic_axes = None
+        boards, elos_self, elos_oppo = boards[:1], elos_self[:1], elos_oppo[:1]
+
+    # The caller loads the model on CPU (see main()); no per-export .cpu() copy.
+    model.eval()
+    # no_grad, not inference_mode: the TorchScript tracer behind
+    # torch.onnx.export cannot trace inference tensors.
     with torch.no_grad():
         torch.onnx.export(
-            model_cpu,
+            model,
             (boards, elos_self, elos_oppo),
             str(output_path),
             input_names=["board_input", "elo_self", "elo_oppo"],
             output_names=["move_probs", "side_info_logits", "win_prob"],
-            dynamic_axes={
-                "board_input": {0: "batch"},
-                "elo_self": {0: "batch"},
-                "elo_oppo": {0: "batch"},
-                "move_probs": {0: "batch"},
-                "side_info_logits": {0: "batch"},
-                "win_logits": {0: "batch"},
-            },
+            dynamic_axes=dynamic_axes,
             opset_version=opset,
             do_constant_folding=True,
+            # Never let dropout/batch-norm training behaviour into the graph.
+            training=torch.onnx.TrainingMode.EVAL,
         )
 
     print(f"Exported ONNX model to {output_path}")
@@ -105,19 +120,101 @@ def export_onnx_model(
     print("ONNX model structure validated.")
 
 
-def _run_torch(model: torch.nn.Module, boards, elos_self, elos_oppo):
-    model.eval()
-    with torch.no_grad():
-        return model(boards, elos_self, elos_oppo)
+def _legal_move_mask(fens: List[str]) -> np.ndarray:
+    """``(len(fens), vocab)`` boolean mask of the legal moves, in the model's (mirrored) frame."""
+    from maia2.utils import get_all_possible_moves
+
+    all_moves = get_all_possible_moves()
+    move_index = {uci: i for i, uci in enumerate(all_moves)}
+    legal = np.zeros((len(fens), len(all_moves)), dtype=bool)
+    for row, fen in enumerate(fens):
+        legal[row, [move_index[m.uci()] for m in model_board(fen).generate_legal_moves()]] = True
+    return legal
+
+
+class ModelVerifier:
+    """Side-by-side parity check between the PyTorch model and an ONNX export.
+
+    The ORT session is created once and reused for every ``verify`` call, so
+    checking several FEN sets against the same graph does not reload it.
+    """
 
+    OUTPUT_NAMES = ("move_probs", "side_info_logits", "win_prob")
 
-def _run_onnx(session: ort.InferenceSession, boards, elos_self, elos_oppo):
-    inputs = {
-        "board_input": boards.cpu().numpy(),
-        "elo_self": elos_self.cpu().numpy(),
-        "elo_oppo": elos_oppo.cpu().numpy(),
-    }
-    return session.run(None, inputs)
+    def __init__(self, torch_model: torch.nn.Module, onnx_path: Path) -> None:
+        self.torch_model = torch_model.eval()
+        self.ort_session = ort.InferenceSession(
+            str(onnx_path),
+            sess_options=session_options(),
+            providers=["CPUExecutionProvider"],
+        )
+
+    def _run_both(self, fens: Iterable[str], elo: int):
+        """Run all FENs as one batch through both runtimes; returns NumPy outputs."""
+        import torch
+
+        boards, elos_self, elos_oppo = _prepare_inputs(fens, elo)
+
+        with torch.no_grad():
+            torch_logits = self.torch_model(boards, elos_self, elos_oppo)
+        ort_logits = self.ort_session.run(
+            None,
+            {
+                "board_input": boards.numpy(),
+                "elo_self": elos_self.numpy(),
+                "elo_oppo": elos_oppo.numpy(),
+            },
+        )
+        return [out.cpu().numpy() for out in torch_logits], ort_logits
+
+    def verify(self, fens: Iterable[str], elo: int, atol: float = 1e-4) -> None:
+        """Require every output head to match PyTorch within ``atol``."""
+        torch_logits, ort_logits = self._run_both(fens, elo)
+
+        for name, torch_out, ort_out in zip(self.OUTPUT_NAMES, torch_logits, ort_logits):
+            diff = np.max(np.abs(torch_out - ort_out))
+            print(f"Δ({name}) = {diff:.6f}")
+            if diff > atol:
+                raise RuntimeError(
+                    f"ONNX output '{name}' deviates from PyTorch by {diff:.6f}, "
+                    f"which is above tolerance {atol}."
+                )
+        print("Numerical parity check passed.")
+
+    def verify_decisions(
+        self,
+        fens: Iterable[str],
+        elo: int,
+        min_top1: float = 0.98,
+        win_atol: float = 5e-2,
+    ) -> None:
+        """Check what serving uses: the best legal move and the win-probability head.
+
+        Quantised graphs drift on raw logits (and on the auxiliary
+        side-info head, which nothing reads), so instead of a max-abs gate
+        this requires the legal-masked ``move_probs`` argmax to agree with
+        PyTorch on at least ``min_top1`` of the positions and ``win_prob``
+        to stay within ``win_atol``.
+        """
+        fens = list(fens)
+        torch_logits, ort_logits = self._run_both(fens, elo)
+
+        legal = _legal_move_mask(fens)
+        torch_best = np.where(legal, torch_logits[0], -np.inf).argmax(axis=1)
+        ort_best = np.where(legal, ort_logits[0], -np.inf).argmax(axis=1)
+        top1 = float(np.mean(torch_best == ort_best))
+        win_diff = float(np.max(np.abs(torch_logits[2] - ort_logits[2])))
+        print(f"top-1 move agreement = {top1:.2%}, Δ(win_prob) = {win_diff:.6f}")
+        if top1 < min_top1:
+            raise RuntimeError(
+                f"ONNX best-move agreement with PyTorch is {top1:.2%}, below {min_top1:.2%}."
+            )
+        if win_diff > win_atol:
+            raise RuntimeError(
+                f"ONNX output 'win_prob' deviates from PyTorch by {win_diff:.6f}, "
+                f"which is above tolerance {win_atol}."
+            )
+        print("Decision parity check passed.")
 
 
 def verify_against_pytorch(
@@ -127,41 +224,173 @@ def verify_against_pytorch(
     elo: int,
     atol: float = 1e-4,
 ) -> None:
-    boards, elos_self, elos_oppo = _prepare_inputs(fens, elo)
+    ModelVerifier(model, onnx_path).verify(fens, elo, atol=atol)
 
-    torch_logits = _run_torch(model, boards, elos_self, elos_oppo)
-    ort_sess = ort.InferenceSession(str(onnx_path))
-    ort_logits = _run_onnx(ort_sess, boards, elos_self, elos_oppo)
 
-    names = ["move_probs", "side_info_logits", "win_prob"]
-    for name, torch_out, ort_out in zip(names, torch_logits, ort_logits):
-        diff = np.max(np.abs(torch_out.cpu().numpy() - ort_out))
-        print(f"Δ({name}) = {diff:.6f}")
-        if diff > atol:
-            raise RuntimeError(
-                f"ONNX output '{name}' deviates from PyTorch by {diff:.6f}, "
-                f"which is above tolerance {atol}."
-            )
-    print("Numerical parity check passed.")
+def _cpu_has_vnni() -> bool:
+    """Detect AVX-VNNI / AVX512-VNNI, which ORT's signed INT8 MatMul kernels need."""
+    try:
+        import cpuinfo  # py-cpuinfo, optional
+
+        flags = set(cpuinfo.get_cpu_info().get("flags", []))
+    except ImportError:
+        try:
+            with open("/proc/cpuinfo", "r", encoding="utf-8") as fh:
+                flags = set(fh.read().split())
+        except OSError:
+            return False
+    return bool(flags & {"avx512_vnni", "avx512vnni", "avx_vnni", "avxvnni"})
 
 
 def maybe_quantize(onnx_path: Path, output_path: Path) -> None:
-    print(f"Quantising {onnx_path} → {output_path} (dynamic INT8 on linear ops)…")
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    if _cpu_has_vnni():
+        # VNNI: signed per-channel weights hit the fast u8s8 kernels and keep accuracy.
+        recipe = "u8s8, per-channel"
+        quant_kwargs = dict(
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+            reduce_range=False,
+            extra_options={"MatMulConstBOnly": True, "EnableSubgraph": True},
+        )
+    else:
+        # Pre-VNNI CPUs: u8u8 with reduced range avoids the slow-INT8 failure mode.
+        recipe = "u8u8, reduced range"
+        quant_kwargs = dict(
+            weight_type=QuantType.QUInt8,
+            reduce_range=True,
+            extra_options={"MatMulConstBOnly": True},
+        )
+
+    print(f"Quantising {onnx_path} → {output_path} (dynamic INT8 on MatMul, {recipe})…")
+    # Dynamic quantisation always emits QOperator-style nodes
+    # (DynamicQuantizeLinear + MatMulInteger) that the CPU EP runs on MLAS
+    # directly; MatMulConstBOnly keeps activation-by-activation MatMuls in FP32.
     quantize_dynamic(
         model_input=str(onnx_path),
         model_output=str(output_path),
-        op_types_to_quantize=["MatMul", "Gemm"],
-        weight_type=QuantType.QInt8,
-        optimize_model=True,
-        per_channel=False,
-        reduce_range=False,
+        op_types_to_quantize=["MatMul"],
+        **quant_kwargs,
+    )
+    orig_size = onnx_path.stat().st_size / (1024 * 1024)
+    quant_size = output_path.stat().st_size / (1024 * 1024)
+    print(f"  size: {orig_size:.2f} MiB → {quant_size:.2f} MiB")
+
+
+class FENCalibrationDataReader:
+    """Feeds batched ``{board_input, elo_self, elo_oppo}`` dicts for calibration.
+
+    Implements the ``onnxruntime.quantization.CalibrationDataReader``
+    protocol (``get_next``/``rewind``) without subclassing it, so defining
+    the class does not import the quantisation toolkit.
+    """
+
+    def __init__(self, fens: Iterable[str], elo: int, batch_size: int = 32, limit: int = 512) -> None:
+        fens = list(fens)[:limit]
+        bucket = elo_bucket(elo)
+        self._batches = []
+        for start in range(0, len(fens), batch_size):
+            boards = boards_to_planes([model_board(fen) for fen in fens[start : start + batch_size]])
+            elos = np.full((boards.shape[0],), bucket, dtype=np.int64)
+            self._batches.append({"board_input": boards, "elo_self": elos, "elo_oppo": elos.copy()})
+        self._iter = iter(self._batches)
+
+    def get_next(self):
+        return next(self._iter, None)
+
+    def rewind(self) -> None:
+        self._iter = iter(self._batches)
+
+
+def split_calibration_fens(fens: List[str], holdout_every: int = 5) -> Tuple[List[str], List[str]]:
+    """Deterministically hold out every ``holdout_every``-th FEN for the accuracy gate.
+
+    Returns ``(calibration, holdout)``; the static INT8 gate is only
+    meaningful on positions the activation ranges were not fitted to.
+    """
+    calibration = [fen for i, fen in enumerate(fens) if i % holdout_every]
+    return calibration, fens[::holdout_every]
+
+
+def static_quantize(
+    onnx_path: Path, output_path: Path, fens: Iterable[str], elo: int, batch_size: int = 32
+) -> None:
+    """Full INT8 with calibrated activation ranges; use ``batch_size=1`` for the fixed batch=1 graph."""
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+
+    reader = FENCalibrationDataReader(fens, elo, batch_size=batch_size)
+    print(f"Quantising {onnx_path} → {output_path} (static INT8 weights + activations on MatMul)…")
+    quantize_static(
+        model_input=str(onnx_path),
+        model_output=str(output_path),
+        calibration_data_reader=reader,
         quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        op_types_to_quantize=["MatMul"],
     )
     orig_size = onnx_path.stat().st_size / (1024 * 1024)
     quant_size = output_path.stat().st_size / (1024 * 1024)
     print(f"  size: {orig_size:.2f} MiB → {quant_size:.2f} MiB")
 
 
+def check_batch_parity(
+    onnx_path: Path,
+    fens: Iterable[str],
+    elo: int,
+    batch_size: int = 32,
+    bs1_path: Path | None = None,
+) -> float:
+    """Fraction of positions whose best legal move changes when batched.
+
+    Each FEN is run alone (through ``bs1_path`` if given, as the server does
+    for lone requests) and in batches of ``batch_size`` through
+    ``onnx_path``.  Dynamic INT8 (``DynamicQuantizeLinear``) derives one
+    activation scale from the whole batch tensor, so its answers depend on
+    the other positions in the batch; FP32 and static INT8 graphs should
+    report 0.
+    """
+    fens = list(fens)
+    batched = ort.InferenceSession(
+        str(onnx_path), sess_options=session_options(), providers=["CPUExecutionProvider"]
+    )
+    single = batched if bs1_path is None else ort.InferenceSession(
+        str(bs1_path), sess_options=session_options(), providers=["CPUExecutionProvider"]
+    )
+
+    def run(sess: ort.InferenceSession, chunk: List[str]) -> np.ndarray:
+        boards = boards_to_planes([model_board(fen) for fen in chunk])
+        elos = np.full((len(chunk),), elo_bucket(elo), dtype=np.int64)
+        return sess.run(["move_probs"], {"board_input": boards, "elo_self": elos, "elo_oppo": elos})[0]
+
+    legal = _legal_move_mask(fens)
+    alone = np.concatenate([run(single, [fen]) for fen in fens])
+    together = np.concatenate([run(batched, fens[i : i + batch_size]) for i in range(0, len(fens), batch_size)])
+    alone_best = np.where(legal, alone, -np.inf).argmax(axis=1)
+    together_best = np.where(legal, together, -np.inf).argmax(axis=1)
+    changed = int(np.sum(alone_best != together_best))
+    print(f"batch-1 vs batch-{batch_size} best-move disagreement: {changed}/{len(fens)}")
+    return changed / len(fens) if fens else 0.0
+
+
+def stamp_export_metadata(onnx_path: Path, export_id: str, quantization: str) -> None:
+    """Record which export run and quantisation recipe produced ``onnx_path``.
+
+    ``maia-bot-server.py`` only pairs the batch=1 graph with the dynamic one
+    when their ``maia_export_id`` match, so a file left over from an older
+    export is never served next to a newer model.
+    """
+    import onnx
+
+    model = onnx.load(str(onnx_path))
+    props = {prop.key: prop.value for prop in model.metadata_props}
+    props.update(maia_export_id=export_id, maia_quantization=quantization)
+    onnx.helper.set_model_props(model, props)
+    onnx.save(model, str(onnx_path))
+
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument(
@@ -175,12 +404,58 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Also produce a dynamically quantised model",
     )
+    parser.add_argument(
+        "--static-quantize",
+        action="store_true",
+        help="Try static INT8 (calibrated activations); falls back to dynamic if inaccurate",
+    )
+    parser.add_argument(
+        "--calibration-fens",
+        type=str,
+        default=None,
+        help="JSON/line-delimited FEN file for static calibration (required by --static-quantize)",
+    )
+    parser.add_argument(
+        "--static-quantize-min-fens",
+        type=int,
+        default=256,
+        help="Min calibration-file FENs (outside the verification set) before static INT8 is attempted",
+    )
+    parser.add_argument(
+        "--static-quantize-atol",
+        type=float,
+        default=5e-2,
+        help="Max allowed win_prob deviation from PyTorch for the static INT8 model (held-out FENs)",
+    )
+    parser.add_argument(
+        "--static-quantize-min-top1",
+        type=float,
+        default=0.98,
+        help="Min fraction of held-out positions where the static INT8 model picks PyTorch's best move",
+    )
     parser.add_argument(
         "--quantized-output",
         default="maia2_models/rapid_model_quantized.onnx",
         type=Path,
         help="Target path for the quantised model (if --quantize)",
     )
+    parser.add_argument(
+        "--export-static-bs1",
+        action="store_true",
+        help="Also export a fixed batch=1 graph (no dynamic axes) for the server",
+    )
+    parser.add_argument(
+        "--static-output",
+        default="maia2_models/rapid_model_bs1.onnx",
+        type=Path,
+        help="Target path for the batch=1 model (if --export-static-bs1)",
+    )
+    parser.add_argument(
+        "--static-quantized-output",
+        default="maia2_models/rapid_model_bs1_quantized.onnx",
+        type=Path,
+        help="Target path for the quantised batch=1 model (if both flags are set)",
+    )
     parser.add_argument(
         "--opset",
         type=int,
@@ -222,6 +497,9 @@ def load_additional_fens(path: str | None) -> Iterable[str]:
 def main() -> None:
     args = parse_args()
 
+    import torch
+    from maia2 import model as maia_model_lib
+
     device = torch.device("cpu")
     print("Loading Maia2 rapid model…")
     maia_model = maia_model_lib.from_pretrained(type="rapid", device=device)
@@ -232,11 +510,98 @@ def main() -> None:
     seen = set()
     sample_fens = [fen for fen in sample_fens if not (fen in seen or seen.add(fen))]
 
-    export_onnx_model(maia_model, args.output, sample_fens, args.verification_elo, opset=args.opset)
-    verify_against_pytorch(maia_model, args.output, sample_fens, args.verification_elo)
+    # Every graph written by this run is stamped with the same id (see
+    # stamp_export_metadata) once all of them exist.
+    export_id = uuid.uuid4().hex
+    artifacts = [(args.output, "fp32")]
 
-    if args.quantize:
+    export_onnx_model(maia_model, args.output, sample_fens, args.verification_elo, opset=args.opset)
+    verifier = ModelVerifier(maia_model, args.output)
+    verifier.verify(sample_fens, args.verification_elo)
+
+    if args.export_static_bs1:
+        export_onnx_model(
+            maia_model,
+            args.static_output,
+            sample_fens,
+            args.verification_elo,
+            opset=args.opset,
+            dynamic_batch=False,
+        )
+        static_verifier = ModelVerifier(maia_model, args.static_output)
+        for fen in sample_fens:
+            static_verifier.verify([fen], args.verification_elo)
+        artifacts.append((args.static_output, "fp32"))
+
+    quantization = None
+    # Calibration positions come only from the dedicated file (never the
+    # verification set); static mode holds a fifth of them out for its gate,
+    # and all of them feed the batch-parity report.
+    calibration_pool = [
+        fen
+        for fen in load_additional_fens(args.calibration_fens)
+        if not (fen in seen or seen.add(fen))
+    ]
+
+    if args.static_quantize:
+        static_accepted = False
+        if len(calibration_pool) < args.static_quantize_min_fens:
+            print(
+                f"Static INT8 skipped: need at least {args.static_quantize_min_fens} calibration FENs "
+                f"outside the verification set, got {len(calibration_pool)} (see --calibration-fens)."
+            )
+        else:
+            calibration_fens, holdout_fens = split_calibration_fens(calibration_pool)
+            print(f"Calibrating on {len(calibration_fens)} FENs, gating on {len(holdout_fens)} held-out FENs.")
+            static_quantize(args.output, args.quantized_output, calibration_fens, args.verification_elo)
+            try:
+                ModelVerifier(maia_model, args.quantized_output).verify_decisions(
+                    holdout_fens + sample_fens,
+                    args.verification_elo,
+                    min_top1=args.static_quantize_min_top1,
+                    win_atol=args.static_quantize_atol,
+                )
+                static_accepted = True
+            except RuntimeError as exc:
+                print(f"Static INT8 model rejected: {exc}")
+        if not static_accepted:
+            print("Falling back to weight-only dynamic quantisation.")
+            maybe_quantize(args.output, args.quantized_output)
+        quantization = "static" if static_accepted else "dynamic"
+    elif args.quantize:
         maybe_quantize(args.output, args.quantized_output)
+        quantization = "dynamic"
+
+    if quantization is not None:
+        artifacts.append((args.quantized_output, quantization))
+        if args.export_static_bs1:
+            # The server sends lone positions to the batch=1 graph, so it must
+            # get the same recipe as the main graph or answers would depend on
+            # whether a request happened to be batched.
+            if quantization == "static":
+                static_quantize(
+                    args.static_output,
+                    args.static_quantized_output,
+                    calibration_fens,
+                    args.verification_elo,
+                    batch_size=1,
+                )
+            else:
+                maybe_quantize(args.static_output, args.static_quantized_output)
+            artifacts.append((args.static_quantized_output, quantization))
+
+        # Report how much batching alone changes the served answer; the
+        # server disables micro-batching for graphs where this is non-zero
+        # by construction (dynamic INT8).
+        check_batch_parity(
+            args.quantized_output,
+            sample_fens + calibration_pool,
+            args.verification_elo,
+            bs1_path=args.static_quantized_output if args.export_static_bs1 else None,
+        )
+
+    for path, recipe in artifacts:
+        stamp_export_metadata(path, export_id, recipe)
 
     print("All done.")
 
@@ -3,13 +3,19 @@
 Export the Maia2 move vocabulary (UCI list) used during training/inference
 to a JSON file. Host this JSON on a CDN and point the browser userscript to it.
 
-Output: maia2_models/move_vocab.json
+A packed binary copy (fixed-width 5-byte UCI strings, dtype '|S5') is written
+alongside it so the Python server can load the vocabulary with a single
+np.frombuffer call instead of parsing JSON.
+
+Output: maia2_models/move_vocab.json, maia2_models/move_vocab.bin
 """
 
 import json
 import os
 import sys
 
+import numpy as np
+
 # Ensure local maia2 package is importable (repo layout: ./maia2/maia2)
 REPO_DIR = os.path.dirname(__file__)
 PKG_PARENT = os.path.join(REPO_DIR, "maia2")
@@ -27,6 +33,10 @@ def main():
         json.dump(moves, f, ensure_ascii=False, separators=(",", ":"))
     print(f"Wrote {out_path}")
 
+    bin_path = "maia2_models/move_vocab.bin"
+    np.array(moves, dtype="|S5").tofile(bin_path)
+    print(f"Wrote {bin_path}")
+
 
 if __name__ == "__main__":
     main()
@@ -1,50 +1,291 @@
+"""
+Server HTTP Maia2 (ONNX Runtime). Jalankan dengan WSGI produksi, misalnya:
+
+    gunicorn --chdir <repo> -w 1 -k gthread --threads 32 -b 0.0.0.0:55555 'maia-bot-server:create_app()'
+
+`python maia-bot-server.py` menjalankan perintah yang sama (jumlah worker dan
+thread bisa diatur lewat MAIA_WORKERS / MAIA_THREADS).
+
+Sengaja hanya 1 worker dengan banyak thread: setiap proses worker memuat model
+sendiri, punya cache LRU dan /stats sendiri, serta micro-batcher sendiri. Dengan
+banyak worker, request tersebar antar proses sehingga batch jarang lebih dari 1
+padahal tiap request tetap menunggu MAX_DELAY_MS, dan worker x ORT_INTRA thread
+intra-op membuat CPU oversubscribed. Tambah worker (mis. 2) hanya bila satu
+proses terbukti menjadi bottleneck, dan turunkan ORT_INTRA sebanding.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from functools import lru_cache
+
+# Semua path data di-resolve relatif terhadap file ini agar server bisa
+# dijalankan dari direktori mana pun.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+GUNICORN_CMD = [
+    "gunicorn",
+    "--chdir", BASE_DIR,
+    "-w", os.environ.get("MAIA_WORKERS", "1"),
+    "-k", "gthread",
+    # Thread gthread sebagian besar hanya menunggu hasil micro-batcher, jadi
+    # cukup banyak agar satu batch bisa terisi hingga MAX_BATCH.
+    "--threads", os.environ.get("MAIA_THREADS", "32"),
+    "-b", "0.0.0.0:55555",
+    "maia-bot-server:create_app()",
+]
+
+if __name__ == '__main__':
+    # Proses ini hanya launcher: langsung exec gunicorn sebelum onnxruntime,
+    # Flask, dan vocabulary dimuat.
+    os.execvp(GUNICORN_CMD[0], GUNICORN_CMD)
+
+import chess
+import numpy as np
+import onnxruntime as ort
 from flask import Flask, request, jsonify
-import torch
-from maia2 import model, inference
+
+# Encoder 18 channel, bucket ELO, dan resep SessionOptions dipakai bersama
+# dengan convert_model agar server dan export tidak menyimpang.
+from maia_preprocessing import boards_to_planes, elo_bucket, session_options
 
 app = Flask(__name__)
 
-# Gunakan 'cpu' jika Anda tidak memiliki GPU/CUDA. Ganti ke 'cuda' jika ada.
-DEVICE = "cpu"
-maia2_model = None
-prepared = None
+# Hanya peringatan/error yang dicatat secara default agar logging tidak membebani
+# jalur request; atur MAIA_LOG_LEVEL=INFO untuk melihat pesan saat memuat model.
+logger = logging.getLogger("maia-bot-server")
+logger.setLevel(os.environ.get("MAIA_LOG_LEVEL", "WARNING"))
 
-def load_model():
-    """Memuat model Maia2 dan objek inferensi."""
-    global maia2_model, prepared
-    if maia2_model is None:
-        print("Memuat model Maia2 untuk pertama kali...")
-        try:
-            maia2_model = model.from_pretrained(type="rapid", device=DEVICE)
-            prepared = inference.prepare()
-            print("Model Maia2 berhasil dimuat.")
-        except Exception as e:
-            print(f"Gagal memuat model Maia2: {e}")
-            # Jika model gagal dimuat, kita tidak bisa melanjutkan.
-            # Di aplikasi nyata, Anda mungkin ingin menangani ini dengan lebih baik.
-            exit()
+# Model INT8 hasil `convert_model.py --quantize`. Untuk CPU tanpa VNNI, arahkan
+# MAIA_MODEL_PATH ke varian u8u8 agar tidak lebih lambat dari FP32.
+MODEL_PATH = os.environ.get(
+    "MAIA_MODEL_PATH", os.path.join(BASE_DIR, "maia2_models", "rapid_model_quantized.onnx")
+)
+# Graph batch=1 statis (`convert_model.py --export-static-bs1 --quantize`), dipakai
+# untuk batch berisi satu posisi; batch lebih besar tetap memakai graph dinamis
+# di atas. Hanya dimuat bila `maia_export_id`-nya sama dengan model utama, yaitu
+# hasil export (dan resep kuantisasi) yang sama.
+MODEL_BS1_PATH = os.environ.get(
+    "MAIA_MODEL_BS1_PATH", os.path.join(BASE_DIR, "maia2_models", "rapid_model_bs1_quantized.onnx")
+)
+MOVE_VOCAB_PATH = os.path.join(BASE_DIR, "maia2_models", "move_vocab.bin")
+session = None
+session_bs1 = None
 
-def get_maia_move(fen_string: str, elo: int) -> str | None:
+# Micro-batching: request menunggu maksimal MAX_DELAY_MS di antrean, lalu worker
+# menjalankan hingga MAX_BATCH posisi sekaligus dalam satu session.run().
+#
+# Hanya aman untuk graph yang hasilnya tidak bergantung pada isi batch (FP32 atau
+# INT8 statis). Graph INT8 dinamis (DynamicQuantizeLinear, termasuk
+# rapid_model_quantized.onnx bawaan) memakai satu skala aktivasi untuk seluruh
+# batch, sehingga langkah terbaik suatu posisi bisa berubah tergantung request
+# lain yang kebetulan satu batch (lihat `convert_model.check_batch_parity`), dan
+# cache LRU akan menyimpan jawaban mana pun yang datang duluan. Untuk graph
+# seperti itu batch dibatasi 1; set MAIA_ALLOW_BATCH_DRIFT=1 untuk tetap
+# mem-batch dan menerima drift tersebut demi throughput.
+MAX_BATCH = 32
+MAX_DELAY_MS = 8
+REQUEST_TIMEOUT_S = 2.0
+ALLOW_BATCH_DRIFT = os.environ.get("MAIA_ALLOW_BATCH_DRIFT") == "1"
+_batch_limit = MAX_BATCH
+_request_queue = queue.Queue()
+_worker = None
+
+# Vocabulary langkah (hasil export_move_vocab.py, string UCI 5-byte tetap) dimuat
+# sekali saat import, sehingga indeks hasil argmax bisa langsung dipetakan ke UCI.
+with open(MOVE_VOCAB_PATH, "rb") as f:
+    MOVE_VOCAB = np.frombuffer(f.read(), dtype="|S5")
+MOVE_TO_IDX = {uci.decode(): i for i, uci in enumerate(MOVE_VOCAB.tolist())}
+
+# Buffer batch (papan, ELO, mask langkah ilegal) dialokasikan sekali lalu diisi ulang
+# in-place oleh worker. Hanya thread worker yang menyentuhnya, jadi tanpa lock.
+_BOARD_BUF = np.zeros((MAX_BATCH, 18, 8, 8), dtype=np.float32)
+_ELO_SELF_BUF = np.empty((MAX_BATCH,), dtype=np.int64)
+_ELO_OPPO_BUF = np.empty((MAX_BATCH,), dtype=np.int64)
+_ILLEGAL_MASK = np.ones((MAX_BATCH, len(MOVE_VOCAB)), dtype=bool)
+
+def _create_session(path: str) -> ort.InferenceSession:
+    # Thread, arena memori, dan level optimasi (termasuk layout NCHWc) mengikuti
+    # `maia_preprocessing.session_options`; atur jumlah thread lewat ORT_INTRA.
+    sess = ort.InferenceSession(path, sess_options=session_options(), providers=["CPUExecutionProvider"])
+    # Gagal secara eksplisit daripada diam-diam jatuh ke provider lain.
+    sess.disable_fallback()
+    return sess
+
+def _export_id(sess: ort.InferenceSession) -> str | None:
+    """`maia_export_id` yang dicap `convert_model.py` pada metadata model, bila ada."""
+    return sess.get_modelmeta().custom_metadata_map.get("maia_export_id")
+
+def _is_batch_invariant(path: str) -> bool:
+    """False bila graph memakai DynamicQuantizeLinear (skala aktivasi per batch)."""
+    import onnx
+
+    model = onnx.load(path, load_external_data=False)
+    return not any(node.op_type == "DynamicQuantizeLinear" for node in model.graph.node)
+
+def _warm_up(sess: ort.InferenceSession, batch: int = 1, runs: int = 3) -> None:
     """
-    Menjalankan model Maia2 untuk mendapatkan langkah terbaik berdasarkan FEN dan ELO.
+    Menjalankan inferensi dummy (posisi awal) sebesar `batch` agar request
+    pertama tidak menanggung biaya pemilihan kernel dan pertumbuhan memory
+    arena. Memory pattern ORT direncanakan per shape, jadi warm-up memakai
+    ukuran batch yang benar-benar akan dilayani session tersebut. Dipanggil
+    sebelum thread worker berjalan, jadi aman memakai buffer batch.
     """
+    boards_to_planes([chess.Board()] * batch, out=_BOARD_BUF[:batch])
+    _ELO_SELF_BUF[:batch] = _ELO_OPPO_BUF[:batch] = elo_bucket(1500)
+    feeds = {
+        "board_input": _BOARD_BUF[:batch],
+        "elo_self": _ELO_SELF_BUF[:batch],
+        "elo_oppo": _ELO_OPPO_BUF[:batch],
+    }
+    for _ in range(runs):
+        start = time.perf_counter()
+        sess.run(["move_probs"], feeds)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    logger.info("Warm-up batch=%d selesai, perkiraan latensi p50: %.2f ms", batch, elapsed_ms)
+
+def load_model():
+    """Membuat sesi ONNX Runtime untuk model Maia2 (sekali saja)."""
+    global session, session_bs1, _batch_limit, _worker
+    if session is None:
+        logger.info("Memuat model Maia2 dari %s...", MODEL_PATH)
+        try:
+            session = _create_session(MODEL_PATH)
+            if os.path.exists(MODEL_BS1_PATH):
+                logger.info("Memuat graph batch=1 dari %s...", MODEL_BS1_PATH)
+                candidate = _create_session(MODEL_BS1_PATH)
+                if _export_id(candidate) is not None and _export_id(candidate) == _export_id(session):
+                    session_bs1 = candidate
+                else:
+                    # File sisa export lama (atau tanpa metadata): request tunggal
+                    # dan batch harus dilayani model yang sama.
+                    logger.warning(
+                        "Graph batch=1 %s diabaikan: bukan hasil export yang sama dengan %s.",
+                        MODEL_BS1_PATH, MODEL_PATH,
+                    )
+            if not ALLOW_BATCH_DRIFT and not _is_batch_invariant(MODEL_PATH):
+                _batch_limit = 1
+                logger.warning(
+                    "%s memakai INT8 dinamis; micro-batching dimatikan agar jawaban "
+                    "tidak bergantung pada isi batch (pakai FP32/INT8 statis, atau "
+                    "MAIA_ALLOW_BATCH_DRIFT=1).",
+                    MODEL_PATH,
+                )
+            # Graph dinamis melayani batch penuh; batch berisi satu posisi
+            # dilayani graph batch=1 bila ada, jika tidak oleh graph dinamis juga.
+            if _batch_limit > 1:
+                _warm_up(session, _batch_limit)
+            _warm_up(session_bs1 if session_bs1 is not None else session, 1)
+            _worker = threading.Thread(target=_batch_worker, name="maia-batcher", daemon=True)
+            _worker.start()
+            logger.info("Model Maia2 berhasil dimuat.")
+        except Exception:
+            # Jika model gagal dimuat, kita tidak bisa melanjutkan; biarkan
+            # worker WSGI gagal start.
+            logger.exception("Gagal memuat model Maia2")
+            raise
+
+def mirror_move(uci: str) -> str:
+    """Mencerminkan langkah UCI secara vertikal (rank 1 <-> 8), promosi dipertahankan."""
+    return f"{uci[0]}{9 - int(uci[1])}{uci[2]}{9 - int(uci[3])}{uci[4:]}"
+
+def _fill_illegal_mask(board: chess.Board, mask: np.ndarray) -> np.ndarray:
+    """Mengisi `mask` boolean: True untuk setiap langkah vocabulary yang ilegal di `board`."""
+    mask.fill(True)
+    mask[[MOVE_TO_IDX[move.uci()] for move in board.generate_legal_moves()]] = False
+    return mask
+
+def _run_batch(items: list) -> None:
+    """Menjalankan satu batch `(board, bucket, event, result_box)` dan membagikan hasilnya."""
+    n = len(items)
     try:
-        move_probs, win_prob = inference.inference_each(
-            maia2_model,
-            prepared,
-            fen=fen_string,
-            elo_self=elo,
-            elo_oppo=elo
+        boards_to_planes([board for board, _, _, _ in items], out=_BOARD_BUF[:n])
+        for i, (board, bucket, _, _) in enumerate(items):
+            _fill_illegal_mask(board, _ILLEGAL_MASK[i])
+            _ELO_SELF_BUF[i] = bucket
+            _ELO_OPPO_BUF[i] = bucket
+
+        sess = session_bs1 if n == 1 and session_bs1 is not None else session
+        out = sess.run(
+            ["move_probs"],
+            {
+                "board_input": _BOARD_BUF[:n],
+                "elo_self": _ELO_SELF_BUF[:n],
+                "elo_oppo": _ELO_OPPO_BUF[:n],
+            },
         )
 
-        if not move_probs:
-            return None
+        # Logit mentah langsung di-argmax: softmax monoton sehingga tidak
+        # mengubah urutan, jadi cukup satu pass mask in-place + argmax.
+        illegal_mask = _ILLEGAL_MASK[:n]
+        logits = out[0]
+        np.copyto(logits, -np.inf, where=illegal_mask)
+        best_idx = logits.argmax(axis=1)
+        has_legal = ~illegal_mask.all(axis=1)
+        for i, (_, _, _, result_box) in enumerate(items):
+            if has_legal[i]:
+                result_box[0] = MOVE_VOCAB[best_idx[i]].decode()
+    except Exception as e:
+        # Exception diteruskan ke tiap request agar hasil gagal tidak ikut di-cache.
+        for _, _, _, result_box in items:
+            result_box[0] = e
+    finally:
+        for _, _, event, _ in items:
+            event.set()
+
+def _batch_worker() -> None:
+    """Mengumpulkan request dari antrean menjadi batch lalu menjalankannya."""
+    while True:
+        items = [_request_queue.get()]
+        deadline = time.monotonic() + MAX_DELAY_MS / 1000
+        while len(items) < _batch_limit:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(_request_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        _run_batch(items)
 
-        best_move = max(move_probs, key=move_probs.get)
-        return best_move
+@lru_cache(maxsize=4096)
+def _cached_infer(fen_string: str, bucket: int) -> str | None:
+    """
+    Inferensi satu posisi lewat micro-batcher. Di-cache per (FEN, bucket ELO)
+    karena model hanya melihat bucket-nya; kegagalan dilempar sebagai exception
+    sehingga tidak tersimpan di cache.
+    """
+    # Maia2 selalu melihat papan dari sisi putih; posisi hitam dicerminkan.
+    # Giliran diambil dari papan hasil parse (bukan dari teks FEN) agar cermin
+    # papan dan cermin balik langkah selalu konsisten.
+    board = chess.Board(fen_string)
+    black_to_move = board.turn == chess.BLACK
+    if black_to_move:
+        board = board.mirror()
 
+    event = threading.Event()
+    result_box = [None]
+    _request_queue.put((board, bucket, event, result_box))
+    if not event.wait(timeout=REQUEST_TIMEOUT_S):
+        raise TimeoutError("Inferensi melebihi batas waktu.")
+
+    best_move = result_box[0]
+    if isinstance(best_move, Exception):
+        raise best_move
+    if best_move is None:
+        return None
+    return mirror_move(best_move) if black_to_move else best_move
+
+def get_maia_move(fen_string: str, elo: int) -> str | None:
+    """
+    Menjalankan model Maia2 untuk mendapatkan langkah terbaik berdasarkan FEN dan ELO.
+    """
+    try:
+        return _cached_infer(fen_string, elo_bucket(elo))
     except Exception as e:
-        print(f"Terjadi kesalahan tak terduga saat inferensi: {e}")
+        logger.warning("Terjadi kesalahan tak terduga saat inferensi: %s", e)
         return None
 
 @app.route('/maia', methods=['GET'])
@@ -71,6 +312,21 @@ def maia_move():
     else:
         return jsonify({"error": "Tidak dapat menentukan langkah terbaik."}), 500
 
-if __name__ == '__main__':
+@app.route('/stats', methods=['GET'])
+def stats():
+    """Endpoint untuk memantau efektivitas cache inferensi."""
+    info = _cached_infer.cache_info()
+    lookups = info.hits + info.misses
+    return jsonify({
+        "cache_hits": info.hits,
+        "cache_misses": info.misses,
+        "cache_size": info.currsize,
+        "cache_maxsize": info.maxsize,
+        "cache_hit_rate": info.hits / lookups if lookups else 0.0,
+    })
+
+def create_app() -> Flask:
+    """Factory untuk server WSGI: memuat model sekali per proses worker."""
+    logging.basicConfig(format="%(asctime)s %(name)s %(levelname)s: %(message)s")
     load_model()
-    app.run(host='0.0.0.0', port=55555)
+    return app
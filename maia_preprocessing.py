@@ -0,0 +1,101 @@
+"""Input preprocessing and ONNX Runtime session settings shared by Maia2 scripts.
+
+``convert_model.py`` (export, verification, calibration) and
+``maia-bot-server.py`` (serving) both import from here so the 18-plane
+board encoding, the ELO buckets and the CPU session recipe cannot drift
+apart.  Only chess, numpy and onnxruntime are needed.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import List
+
+import chess
+import numpy as np
+import onnxruntime as ort
+
+# Lower bound of every ELO bucket in maia2.utils.create_elo_dict (<1100,
+# 1100-1199, ..., >=2000); the searchsorted index is the bucket id.
+ELO_BOUNDS = np.arange(1100, 2001, 100, dtype=np.int32)
+
+PIECE_TYPES = (chess.PAWN, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN, chess.KING)
+
+
+def boards_to_planes(boards: List[chess.Board], out: np.ndarray | None = None) -> np.ndarray:
+    """Vectorised equivalent of ``board_to_tensor`` for a list of boards.
+
+    Only the bitboards and a handful of flags are gathered per board in
+    Python; the 64-square planes are produced for the whole batch by a
+    single ``np.unpackbits`` over the little-endian uint64 bitboards, so
+    bit ``i`` lands on square ``i`` (row, col = divmod(i, 8)).  Pass a
+    ``(len(boards), 18, 8, 8)`` float32 ``out`` to fill a preallocated
+    buffer in place (the server does this for every batch).
+    """
+    n = len(boards)
+    # 12 piece bitboards (white P..K, then black P..K) + en-passant square.
+    bitboards = np.zeros((n, 13), dtype="<u8")
+    # Side to move + castling rights (K, Q, k, q); broadcast to full planes.
+    flags = np.zeros((n, 5), dtype=np.float32)
+    for row, board in enumerate(boards):
+        bitboards[row, :12] = [
+            board.pieces_mask(piece_type, color)
+            for color in (chess.WHITE, chess.BLACK)
+            for piece_type in PIECE_TYPES
+        ]
+        if board.ep_square is not None:
+            bitboards[row, 12] = chess.BB_SQUARES[board.ep_square]
+        flags[row] = (
+            board.turn,
+            board.has_kingside_castling_rights(chess.WHITE),
+            board.has_queenside_castling_rights(chess.WHITE),
+            board.has_kingside_castling_rights(chess.BLACK),
+            board.has_queenside_castling_rights(chess.BLACK),
+        )
+
+    bits = np.unpackbits(bitboards.view(np.uint8), axis=-1, bitorder="little")
+    bits = bits.reshape(n, 13, 8, 8)
+
+    planes = np.empty((n, 18, 8, 8), dtype=np.float32) if out is None else out
+    planes[:, :12] = bits[:, :12]
+    planes[:, 12:17] = flags[:, :, None, None]
+    planes[:, 17] = bits[:, 12]
+    return planes
+
+
+def model_board(fen: str) -> chess.Board:
+    """Parse ``fen`` from the side to move's view, as ``maia2.inference.preprocessing`` does.
+
+    Maia2 always sees white to move; black-to-move positions are mirrored.
+    """
+    board = chess.Board(fen)
+    return board.mirror() if board.turn == chess.BLACK else board
+
+
+def elo_bucket(elo: int) -> int:
+    """Equivalent of ``map_to_category(elo, create_elo_dict())`` without the dict."""
+    return int(np.searchsorted(ELO_BOUNDS, elo, side="right"))
+
+
+def session_options() -> ort.SessionOptions:
+    """CPU session settings tuned for the tiny (18, 8, 8) board input.
+
+    Over-threading hurts at this size, so intra-op threads default to 2
+    (override with ``ORT_INTRA``).  Keep ``ORT_ENABLE_ALL``: only that level
+    runs ORT's NCHWc layout transformer, which rewrites the conv stack into
+    the CPU's blocked channels-last format and only reorders at a few block
+    boundaries (ReorderInput/ReorderOutput pairs) instead of around every
+    Conv, so the exported graph stays plain NCHW.
+    """
+    opts = ort.SessionOptions()
+    opts.intra_op_num_threads = int(os.environ.get("ORT_INTRA", "2"))
+    opts.inter_op_num_threads = 1
+    opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    opts.enable_cpu_mem_arena = True
+    opts.enable_mem_pattern = True
+    # The CPU wheel uses ORT's own thread pool, not OpenMP (OMP_WAIT_POLICY has
+    # no effect); keep its workers spinning between runs so back-to-back
+    # requests do not pay a wake-up on every session.run().
+    opts.add_session_config_entry("session.intra_op.allow_spinning", "1")
+    return opts
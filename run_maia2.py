@@ -1,5 +1,8 @@
+import chess
+import numpy as np
 import torch
 from maia2 import model, inference
+from maia2.utils import board_to_tensor, map_to_category, mirror_move
 
 def get_maia_move(maia_model, prepared_inference, fen_string: str, elo: int) -> str | None:
     """
@@ -18,27 +21,46 @@ def get_maia_move(maia_model, prepared_inference, fen_string: str, elo: int) ->
         print(f"Menganalisis FEN: {fen_string}")
         print(f"Menggunakan ELO: {elo}")
 
-        # Menjalankan inferensi untuk posisi tunggal
-        # elo_self adalah ELO pemain yang sedang giliran
-        # elo_oppo adalah ELO lawan
-        move_probs, win_prob = inference.inference_each(
-            maia_model,
-            prepared_inference,
-            fen=fen_string,
-            elo_self=elo,
-            elo_oppo=elo
-        )
-
-        if not move_probs:
+        # all_moves_dict_reversed memetakan indeks output model -> UCI
+        all_moves_dict, elo_dict, all_moves_dict_reversed = prepared_inference
+
+        # Maia2 selalu melihat papan dari sisi putih; posisi hitam dicerminkan.
+        black_to_move = fen_string.split(" ")[1] == "b"
+        board = chess.Board(fen_string)
+        if black_to_move:
+            board = board.mirror()
+
+        legal_mask = np.zeros(len(all_moves_dict), dtype=bool)
+        legal_mask[[all_moves_dict[move.uci()] for move in board.generate_legal_moves()]] = True
+
+        if not legal_mask.any():
             print("Error: Tidak ada langkah legal yang ditemukan atau model gagal memprediksi.")
             return None
 
-        # Ambil langkah dengan probabilitas tertinggi
-        best_move = max(move_probs, key=move_probs.get)
-        
+        # Menjalankan inferensi untuk posisi tunggal
+        # elo_self adalah ELO pemain yang sedang giliran
+        # elo_oppo adalah ELO lawan
+        device = next(maia_model.parameters()).device
+        elo_bucket = torch.tensor([map_to_category(elo, elo_dict)], device=device)
+        maia_model.eval()
+        with torch.no_grad():
+            logits_maia, _, logits_value = maia_model(
+                board_to_tensor(board).unsqueeze(0).to(device),
+                elo_bucket,
+                elo_bucket,
+            )
+
+        # Ambil langkah dengan probabilitas tertinggi (argmax di atas langkah legal)
+        probs = logits_maia[0].cpu().numpy()
+        probs[~legal_mask] = -np.inf
+        best_move = all_moves_dict_reversed[int(probs.argmax())]
+        if black_to_move:
+            best_move = mirror_move(best_move)
+
+        win_prob = float(np.clip(logits_value.item() / 2 + 0.5, 0.0, 1.0))
+        if black_to_move:
+            win_prob = 1 - win_prob
         print(f"Probabilitas kemenangan: {win_prob*100:.2f}%")
-        # print(f"Probabilitas langkah: {move_probs}")
-
 
         return best_move
 
@@ -62,6 +84,14 @@ if __name__ == "__main__":
         # Menyiapkan objek yang diperlukan untuk inferensi
         prepared = inference.prepare()
 
+        # Pemanasan: beberapa inferensi dummy agar FEN pertama tidak lambat
+        dummy_board = board_to_tensor(chess.Board()).unsqueeze(0).to(DEVICE)
+        dummy_elo = torch.tensor([map_to_category(1500, prepared[1])], device=DEVICE)
+        maia2_model.eval()
+        with torch.inference_mode():
+            for _ in range(3):
+                maia2_model(dummy_board, dummy_elo, dummy_elo)
+
         print("Model Maia2 berhasil dimuat.")
         print("="*50)
         print("Selamat Datang di Maia2 Chess Bot Interaktif")